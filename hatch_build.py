@@ -0,0 +1,32 @@
+"""Build hook that scopes mypyc's shared runtime module to compiled wheels."""
+
+import glob
+import os
+
+from hatchling.builders.hooks.plugin.interface import BuildHookInterface
+
+# mypyc writes its shared runtime module next to the compiled sources, but
+# the mypyc hook only registers it when the package lives at the project root.
+_RUNTIME_GLOB = os.path.join("src", "pypekit", "*__mypyc*.so")
+
+
+class CustomBuildHook(BuildHookInterface):
+    """Ship and then clean up in-place mypyc artifacts.
+
+    Runs after the mypyc hook and does nothing unless that hook compiled
+    the wheel, so default builds stay pure Python even when stale
+    ``.so`` files are lying around in the source tree.
+    """
+
+    def initialize(self, version, build_data):
+        self._compiled = not build_data["pure_python"]
+        if self._compiled:
+            build_data["artifacts"].append(f"/{_RUNTIME_GLOB}")
+
+    def finalize(self, version, build_data, artifact_path):
+        if not self._compiled:
+            return
+        # In-place extensions would shadow the pure-Python sources for
+        # anything importing from the checkout (e.g. the test suite).
+        for path in glob.glob(os.path.join(self.root, "src", "pypekit", "*.so")):
+            os.remove(path)
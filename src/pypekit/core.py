@@ -10,18 +10,67 @@ Core building blocks for *pypekit*.
   caching intermediate results.
 """
 
+import asyncio
+import copy
+import hashlib
+import inspect
+import itertools
+import os
+import pickle
 import sys
 import time
 import traceback
 import uuid
+import warnings
 from abc import ABC, abstractmethod
-from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Type,
+)
 
 from .hashing import stable_hash
 
 SOURCE_TYPE = "source"
 SINK_TYPE = "sink"
 
+_LOG_FLUSH_EVERY = 100
+_LOG_PROGRESS_STEPS = 100
+
+# IDs only need to be unique, not unpredictable: a random per-process prefix
+# keeps them distinct across processes (caches may be persisted) while the
+# counter avoids one os.urandom call per task.  Forked children inherit both,
+# so they draw a fresh prefix.
+_ID_PREFIX = uuid.uuid4().hex[:16]
+_id_counter = itertools.count()
+
+
+def _reset_ids() -> None:
+    global _ID_PREFIX, _id_counter
+    _ID_PREFIX = uuid.uuid4().hex[:16]
+    _id_counter = itertools.count()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_ids)
+
+
+def _new_id() -> str:
+    return f"{_ID_PREFIX}{next(_id_counter):016x}"
+
 
 class Task(ABC):
     """Abstract base class for every processing step.
@@ -42,7 +91,7 @@ class Task(ABC):
     output_types: list[str], class variable
         Declared output type identifiers.
     id : str
-        Randomly generated UUID assigned when the task is inserted into a
+        Unique identifier assigned when the task is inserted into a
         pipeline or repository.
     kwargs : dict
         Keyword arguments used at instantiation time.
@@ -123,10 +172,7 @@ class Node:
             ``input_types``.
         """
 
-        if not any(
-            output_type in child.task.input_types
-            for output_type in self.task.output_types
-        ):
+        if set(self.task.output_types).isdisjoint(child.task.input_types):
             raise ValueError(
                 f"Child cannot be added. Output types {self.task.output_types} of {self.task} "
                 f"do not match input types {child.task.input_types} of {child.task}."
@@ -151,7 +197,7 @@ class Pipeline(Task):
             Tasks that make up the pipeline in order.
         """
 
-        self.id = uuid.uuid4().hex
+        self.id = _new_id()
         self.tasks: List[Task] = []
         if tasks:
             self._build_pipeline(tasks)
@@ -170,8 +216,10 @@ class Pipeline(Task):
             Output of the *last* task.
         """
 
+        run_config = self.run_config
+        for task in self.tasks:
+            task.run_config = run_config
         for task in self.tasks:
-            task.run_config = self.run_config
             input_ = task.run(input_)
         return input_
 
@@ -181,6 +229,17 @@ class Pipeline(Task):
     def __repr__(self) -> str:
         return f"Pipeline(tasks={self.tasks})"
 
+    @classmethod
+    def _from_validated(cls, tasks: List[Task]) -> "Pipeline":
+        pipeline = cls()
+        for task in tasks:
+            task.id = _new_id()
+        pipeline.tasks = tasks
+        if tasks:
+            pipeline.input_types = tasks[0].input_types
+            pipeline.output_types = tasks[-1].output_types
+        return pipeline
+
     def _build_pipeline(self, tasks: List[Task]) -> None:
         self.tasks = []
         for task in tasks:
@@ -196,17 +255,14 @@ class Pipeline(Task):
                 f"Output types {self.tasks[-1].output_types} of {self.tasks[-1]} "
                 f"do not match input types {task.input_types} of {task}."
             )
-        task.id = uuid.uuid4().hex
+        task.id = _new_id()
         self.tasks.append(task)
         if is_first:
             self.input_types = task.input_types
         self.output_types = task.output_types
 
     def _types_fit(self, task: Task) -> bool:
-        return any(
-            output_type in task.input_types
-            for output_type in self.tasks[-1].output_types
-        )
+        return not set(self.output_types).isdisjoint(task.input_types)
 
 
 class Repository:
@@ -242,6 +298,8 @@ class Repository:
         self.leaves: List[Node] = []
         self.pipelines: List[Pipeline] = []
         self.tree_string: str = ""
+        self._by_input_type: Dict[str, int] = defaultdict(int)
+        self._entry_keys: List[Hashable] = []
         if tasks:
             self._build_repository(tasks)
 
@@ -249,6 +307,8 @@ class Repository:
         self, tasks: List[Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]]
     ) -> None:
         self.tasks = []
+        self._by_input_type.clear()
+        self._entry_keys = []
         for task in tasks:
             self._add_task(task)
 
@@ -272,6 +332,23 @@ class Repository:
                 "Tasks must be either an instance of a Task subclass, a Task "
                 "subclass or a tuple of (Task subclass, Dict[str, Any])."
             )
+        for input_type in self._input_types(task):
+            if type(input_type) is str:
+                input_type = sys.intern(input_type)
+            self._by_input_type[input_type] |= 1 << (len(self.tasks) - 1)
+        self._entry_keys.append(self._entry_key(task))
+
+    def _entry_key(
+        self, task: Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]
+    ) -> Hashable:
+        if isinstance(task, tuple):
+            try:
+                return (task[0], stable_hash(task[1]))
+            except Exception:
+                return (task[0], id(task[1]))
+        if isinstance(task, type):
+            return task
+        return id(task)
 
     def build_tree(self, max_depth: int = sys.getrecursionlimit()) -> Node:
         """Generate a tree where paths map to potential pipelines.
@@ -279,7 +356,12 @@ class Repository:
         Starting from an implicit :class:`Root` node, the method attaches
         every task whose ``input_types`` match the current node's
         ``output_types``.  Branches that *do not* end in a task with
-        ``output_types == [\"sink\"]`` are pruned afterwards.
+        ``output_types == [\"sink\"]`` are pruned afterwards.  Identical
+        repository entries (the same class, the same class with equal
+        kwargs, or the same instance) are branched on only once per node,
+        so no two resulting pipelines are the same.  Input types are read
+        from each entry's class, output types from one instance per entry,
+        so they may depend on the entry's kwargs.
 
         Parameters
         ----------
@@ -298,37 +380,138 @@ class Repository:
         """
 
         self.root = Node(Root())
-        self._build_tree_recursive(self.root, self.tasks, 0, max_depth)
-        self._prune_tree()
+        cut_short = self._build_tree_iterative(self.root, max_depth)
+        self._prune_tree(cut_short)
         if not self.leaves:
             self.root = None
             raise ValueError("Tree is empty. Check your input_types and output_types.")
         return self.root
 
-    def _build_tree_recursive(
-        self,
-        node: Node,
-        available_tasks: List[Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]],
-        depth: int,
-        max_depth: int,
-    ) -> None:
-        if depth > max_depth:
-            self.leaves.append(node)
-            return
-        found_valid_task = False
-        for i, task in enumerate(available_tasks):
-            if not self._type_fits(node, task):
+    def _build_tree_iterative(self, root: Node, max_depth: int) -> Set[Node]:
+        tasks = self.tasks
+        # Output types may be set per instance (e.g. from kwargs), so every
+        # entry is probed once as an instance.  Each probe is reused as the
+        # first node built from its entry.
+        probed = [self._instantiate_task(task) for task in tasks]
+        entry_output_types = [tuple(probe.output_types) for probe in probed]
+        probes: List[Optional[Task]] = list(probed)
+
+        def instantiate(i: int) -> Task:
+            probe = probes[i]
+            if probe is None:
+                return self._instantiate_task(tasks[i])
+            probes[i] = None
+            return probe
+
+        # Entries that cannot reach a sink in the type graph, whatever the
+        # chain, would only grow subtrees for _prune_tree to remove again.
+        reachable = self._sink_reachable_mask(entry_output_types)
+        successor_masks: Dict[Tuple[str, ...], int] = {}
+
+        def fitting(output_types: Tuple[str, ...]) -> int:
+            mask = successor_masks.get(output_types)
+            if mask is None:
+                mask = 0
+                for output_type in output_types:
+                    mask |= self._by_input_type.get(output_type, 0)
+                successor_masks[output_types] = mask
+            return mask
+
+        def successors(output_types: Tuple[str, ...], chain_mask: int) -> Iterator[int]:
+            return _set_bits(fitting(output_types) & reachable & ~chain_mask)
+
+        # Leaves that would have had children without the shortcuts below
+        # (sink reachability, dead states) are returned, so that pruning
+        # can order them as if their subtrees had been built and removed.
+        cut_short: Set[Node] = set()
+
+        # A subtree only depends on the output types of its root and on the
+        # set of tasks already in the chain (which also fixes the depth).
+        # States whose expansion reached no sink are remembered so that
+        # equivalent orderings of the same tasks are not explored again.
+        dead_states: Set[Tuple[Tuple[str, ...], int]] = set()
+        entry_keys = self._entry_keys
+        leaves = self.leaves
+        chain_mask = 0
+        root_types = tuple(root.task.output_types)
+        stack: List[
+            Tuple[
+                Node, Tuple[str, ...], Iterator[int], int, Optional[int], Set[Hashable]
+            ]
+        ] = [(root, root_types, successors(root_types, 0), 0, None, set())]
+        reached_sink = [False]
+        while stack:
+            node, output_types, candidates, depth, index, branched = stack[-1]
+            next_index = None
+            for i in candidates:
+                if entry_keys[i] not in branched:
+                    branched.add(entry_keys[i])
+                    next_index = i
+                    break
+            if next_index is None:
+                stack.pop()
+                if not node.children:
+                    leaves.append(node)
+                    if fitting(output_types) & ~chain_mask:
+                        cut_short.add(node)
+                subtree_alive = reached_sink.pop()
+                if index is not None:
+                    if not subtree_alive:
+                        dead_states.add((output_types, chain_mask))
+                    chain_mask &= ~(1 << index)
+                if reached_sink and (subtree_alive or SINK_TYPE in output_types):
+                    reached_sink[-1] = True
+                continue
+            # Successors come from the input-type index, so every edge is
+            # known to fit and children are attached without add_child.
+            child_types = entry_output_types[next_index]
+            child_state = (child_types, chain_mask | 1 << next_index)
+            if depth + 1 > max_depth or child_state in dead_states:
+                # Such a child stays a leaf, so it is only worth
+                # instantiating if it survives pruning as a sink.
+                if SINK_TYPE in child_types:
+                    child = Node(instantiate(next_index), parent=node)
+                    node.children.append(child)
+                    leaves.append(child)
+                    reached_sink[-1] = True
+                    if (
+                        depth + 1 <= max_depth
+                        and fitting(child_types) & ~child_state[1]
+                    ):
+                        cut_short.add(child)
                 continue
-            found_valid_task = True
-            task_instance = self._instantiate_task(task)
-            new_node = Node(task_instance, parent=node)
-            node.add_child(new_node)
-            new_available_task = available_tasks[:i] + available_tasks[i + 1 :]
-            self._build_tree_recursive(
-                new_node, new_available_task, depth + 1, max_depth
+            child = Node(instantiate(next_index), parent=node)
+            node.children.append(child)
+            chain_mask |= 1 << next_index
+            stack.append(
+                (
+                    child,
+                    child_types,
+                    successors(child_types, chain_mask),
+                    depth + 1,
+                    next_index,
+                    set(),
+                )
             )
-        if not found_valid_task:
-            self.leaves.append(node)
+            reached_sink.append(False)
+        return cut_short
+
+    def _sink_reachable_mask(self, entry_output_types: List[Tuple[str, ...]]) -> int:
+        # Walk the type graph backwards from the entries producing a sink.
+        producers: Dict[str, int] = defaultdict(int)
+        for i, output_types in enumerate(entry_output_types):
+            for output_type in output_types:
+                producers[output_type] |= 1 << i
+        reachable = producers.get(SINK_TYPE, 0)
+        frontier = reachable
+        while frontier:
+            mask = 0
+            for i in _set_bits(frontier):
+                for input_type in self._input_types(self.tasks[i]):
+                    mask |= producers.get(input_type, 0)
+            frontier = mask & ~reachable
+            reachable |= frontier
+        return reachable
 
     def _instantiate_task(
         self, task: Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]
@@ -343,35 +526,50 @@ class Repository:
             task_instance = task
             task_kwargs = task.kwargs.copy() if hasattr(task, "kwargs") else {}
         task_instance.kwargs = task_kwargs
-        task_instance.id = uuid.uuid4().hex
+        task_instance.id = _new_id()
         return task_instance
 
-    def _type_fits(
-        self, node: Node, task: Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]
-    ) -> bool:
+    def _input_types(
+        self, task: Task | Type[Task] | Tuple[Type[Task], Dict[str, Any]]
+    ) -> List[str]:
         if isinstance(task, tuple):
-            return any(
-                output_type in task[0].input_types
-                for output_type in node.task.output_types
-            )
-        else:
-            return any(
-                output_type in task.input_types
-                for output_type in node.task.output_types
-            )
-
-    def _prune_tree(self) -> None:
-        for node in self.leaves.copy():
-            self._prune_tree_recursive(node)
-
-    def _prune_tree_recursive(self, node: Node) -> None:
-        if not node.children and node not in self.leaves:
-            self.leaves.append(node)
-        if not SINK_TYPE in node.task.output_types and not node.children:
-            self.leaves.remove(node)
-            if node.parent:
-                node.parent.children.remove(node)
-                self._prune_tree_recursive(node.parent)
+            return task[0].input_types
+        return task.input_types
+
+    def _prune_tree(self, cut_short: Set[Node]) -> None:
+        # Walk up from every leaf that is not a sink for as long as that
+        # leaves the parent childless.  Live children are counted instead of
+        # removing nodes one at a time, and each touched children list is
+        # filtered once at the end.  Parents that become sink leaves are
+        # appended after the surviving leaves, in the order they are found;
+        # so are sink leaves in *cut_short*, whose dead subtrees were never
+        # built but would have been pruned here.
+        dead: Set[Node] = set()
+        remaining: Dict[Node, int] = {}
+        kept: List[Node] = []
+        exposed: List[Node] = []
+        for node in self.leaves:
+            if SINK_TYPE in node.task.output_types:
+                (exposed if node in cut_short else kept).append(node)
+                continue
+            while True:
+                dead.add(node)
+                parent = node.parent
+                if parent is None:
+                    break
+                count = remaining.get(parent, len(parent.children)) - 1
+                remaining[parent] = count
+                if count:
+                    break
+                if SINK_TYPE in parent.task.output_types:
+                    exposed.append(parent)
+                    break
+                node = parent
+        for parent in remaining:
+            parent.children[:] = [
+                child for child in parent.children if child not in dead
+            ]
+        self.leaves = kept + exposed
 
     def build_tree_string(self) -> str:
         """Generate a human-readable string representation of the task tree.
@@ -424,19 +622,114 @@ class Repository:
             If the tree has not been built yet (i.e. no root node exists).
         """
 
+        self.pipelines = list(self.iter_pipelines())
+        return self.pipelines
+
+    def iter_pipelines(self) -> Iterator[Pipeline]:
+        """Lazily yield every valid pipeline from the task tree.
+
+        Same as :py:meth:`build_pipelines`, but each :class:`Pipeline` is
+        created only when the iterator reaches it and nothing is stored
+        on the repository.
+
+        Returns
+        -------
+        Iterator[Pipeline]
+            An iterator over the pipelines in tree order.
+
+        Raises
+        ------
+        ValueError
+            If the tree has not been built yet (i.e. no root node exists).
+        """
+
         if not self.root:
             raise ValueError("Tree has not been built yet.")
-        self.pipelines = []
-        tasks: List[Task] = []
-        self._build_pipelines_recursive(self.root, tasks)
-        return self.pipelines
+        return self._iter_pipelines(self.root)
+
+    def _iter_pipelines(self, root: Node) -> Iterator[Pipeline]:
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            if node.children:
+                stack.extend(reversed(node.children))
+                continue
+            tasks: List[Task] = []
+            while node.parent is not None:
+                tasks.append(node.task)
+                node = node.parent
+            tasks.reverse()
+            # Edges fit by construction: the tree builder only attaches
+            # successors taken from the input-type index.
+            yield Pipeline._from_validated(tasks)
+
+
+class _TrieNode:
+    """Prefix-tree node grouping pipelines that share leading tasks."""
+
+    def __init__(self, task: Task) -> None:
+        self.task = task
+        self.label = str(task)
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.pipelines: List[Tuple[int, Pipeline, Tuple[str, ...]]] = []
+
+
+# Task identity, run_config hash and input hash.
+_ContentKey = Tuple[str, str, str]
+_Step = Tuple[_TrieNode, Tuple[str, ...], Callable[[], Any], float, Optional[bytes]]
+_AsyncRunner = Callable[[Task, Any], Awaitable[Tuple[Any, float]]]
+
+
+def _set_bits(mask: int) -> Iterator[int]:
+    # Indices of the set bits of *mask* in ascending order.
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def _constant(value: Any) -> Callable[[], Any]:
+    return lambda: value
+
+
+def _private_inputs(steps: List[_Step]) -> List[_Step]:
+    # Sibling steps run concurrently, so each gets its own deep copy of the
+    # shared parent output instead of the object itself; a task that
+    # modifies its input in place would otherwise race with its siblings.
+    # Values that cannot be deep-copied are still shared.
+    if len(steps) < 2:
+        return steps
+
+    def copy_of(get_input: Callable[[], Any]) -> Any:
+        input_ = get_input()
+        try:
+            return copy.deepcopy(input_)
+        except Exception:
+            return input_
+
+    return [
+        (node, signature, partial(copy_of, get_input), runtime, digest)
+        for node, signature, get_input, runtime, digest in steps
+    ]
+
 
-    def _build_pipelines_recursive(self, node: Node, tasks: List[Task]) -> None:
-        if not node.children:
-            self.pipelines.append(Pipeline(tasks[1:] + [node.task]))
-            return
-        for child in node.children:
-            self._build_pipelines_recursive(child, tasks + [node.task])
+def _task_identity(task: Task) -> str:
+    # Hash of everything that configures *task*: its class and its instance
+    # state apart from the per-run ``id`` and ``run_config``.  A nested
+    # pipeline is identified by its tasks.  Raises if the state cannot be
+    # hashed, in which case the task must not be cached by content.
+    cls = type(task)
+    name = f"{cls.__module__}.{cls.__qualname__}"
+    if isinstance(task, Pipeline):
+        return stable_hash([name, [_task_identity(t) for t in task.tasks]])
+    state = {k: v for k, v in vars(task).items() if k not in ("id", "run_config")}
+    return stable_hash([name, state])
+
+
+def _timed_run(task: Task, input_: Any) -> Tuple[Any, float]:
+    start_time = time.perf_counter()
+    output = task.run(input_)
+    return output, time.perf_counter() - start_time
 
 
 class CachedExecutor:
@@ -444,38 +737,115 @@ class CachedExecutor:
 
     def __init__(
         self,
-        pipelines: List[Pipeline],
+        pipelines: Iterable[Pipeline],
         cache: Optional[Dict[Tuple[str, ...], Any]] = None,
         verbose: bool = False,
+        max_workers: int = 1,
+        cache_dir: Optional[str | os.PathLike[str]] = None,
+        use_processes: bool = False,
+        share_equal_inputs: bool = False,
     ) -> None:
         """Create an executor.
 
         Parameters
         ----------
-        pipelines : list[Pipeline]
-            Pipelines to execute.
+        pipelines : Iterable[Pipeline]
+            Pipelines to execute, e.g. a list from
+            :py:meth:`Repository.build_pipelines` or the iterator returned
+            by :py:meth:`Repository.iter_pipelines`.
         cache : dict or None, optional
             Pre-populated cache mapping *task signatures* to cached
             outputs and runtimes.  If ``None`` (default) an empty dict is
             created.
         verbose : bool, default ``False``
-            Emit human-readable progress to *stdout*.
+            Emit human-readable progress to *stdout*.  Progress lines are
+            buffered and written in batches.  Lines count finished pipelines
+            (``k/N``); at most a hundred completion lines are emitted per
+            run, while every error is reported.
+        max_workers : int, default ``1``
+            Number of worker threads used to run independent tasks of the
+            same depth concurrently.  With the default of ``1`` everything
+            runs sequentially in the calling thread.  :py:meth:`run_async`
+            uses it as the number of tasks that may run at once.  Sibling
+            tasks that can run at the same time (with more workers, or
+            under :py:meth:`run_async`) each receive their own deep copy of
+            their shared input; tasks should still return new objects
+            rather than modify their input in place, which also keeps
+            cached outputs intact.
+        cache_dir : str or os.PathLike or None, optional
+            Directory for a persistent, content-addressed cache.  Task
+            outputs are pickled to ``<cache_dir>/<digest>.pkl`` where the
+            digest covers the run input, ``run_config`` and the class and
+            instance state (other than ``id`` and ``run_config``) of every
+            task up to that point, so results are reused across executors
+            and processes.  Results of tasks whose state cannot be hashed,
+            and of everything downstream of them, are not persisted.  Only
+            point this at directories you trust, since entries are unpickled
+            on load.
+        use_processes : bool, default ``False``
+            Use a process pool instead of a thread pool when
+            ``max_workers > 1``, for CPU-bound tasks limited by the GIL.
+            Tasks and their inputs and outputs must be picklable, and
+            changes a task makes to its own attributes inside ``run`` are
+            not seen by the calling process.
+        share_equal_inputs : bool, default ``False``
+            Also key results by the task's class and instance state,
+            ``run_config`` and the :func:`stable_hash` of its input, so that
+            a task reached through different prefixes reuses the result when
+            its input is equal.
+            This costs an extra hash of every intermediate output.
         """
 
-        self.pipelines = pipelines
+        self.pipelines = pipelines if isinstance(pipelines, list) else list(pipelines)
         self.cache: Dict[Tuple[str, ...], Any] = cache or {}
         self.verbose = verbose
+        self.max_workers = max_workers
+        self.use_processes = use_processes
+        self.share_equal_inputs = share_equal_inputs
+        self.content_cache: Dict[_ContentKey, Dict[str, Any]] = {}
         self.results: Dict[str, Dict[str, Any]] = {}
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else None
+        if self.cache_dir is not None:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._log_lines: List[str] = []
+        self._trie: Optional[_TrieNode] = None
+        self._trie_ids: Tuple[str, ...] = ()
+
+    def prepare(self) -> "CachedExecutor":
+        """Build the execution plan once for repeated runs.
+
+        By default every call to :py:meth:`run` or :py:meth:`run_async`
+        merges :attr:`pipelines` into a fresh prefix tree.  After
+        ``prepare()`` that tree is kept and reused until ``prepare()`` is
+        called again, which must be done whenever :attr:`pipelines` or the
+        tasks in them change.  Runs raise :class:`ValueError` if the
+        pipelines no longer match the prepared ones.
+
+        Returns
+        -------
+        CachedExecutor
+            The executor itself, so that calls can be chained.
+        """
+
+        self._trie = self._build_trie()
+        self._trie_ids = tuple(pipeline.id for pipeline in self.pipelines)
+        return self
 
     def run(
         self, input_: Optional[Any] = None, run_config: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Dict[str, Any]]:
         """Execute every pipeline and return a nested results dict.
 
-        Caching is keyed by a *signature* consisting of a stable hash of
-        ``input_`` and ``run_config`` followed by the UUIDs of every task
-        executed up to that point.  If the signature already exists, the
-        cached value is used instead of re-running the task.
+        The pipelines are merged into a prefix tree so that every task
+        shared by several pipelines runs only once per call.  Caching is
+        keyed by a *signature* consisting of a stable hash of ``input_``
+        and ``run_config`` followed by the IDs of every task executed up
+        to that point.  If the signature already exists, the cached value
+        is used instead of re-running the task.  If ``cache_dir`` is set,
+        misses in the in-memory cache are looked up on disk before the
+        task is run, and new results are written there.  When
+        ``max_workers > 1`` the trie is executed layer by layer and all
+        tasks of a layer run concurrently in a thread (or process) pool.
 
         Parameters
         ----------
@@ -483,7 +853,8 @@ class CachedExecutor:
             Input object forwarded to the first task of each pipeline.
         run_config : dict or None, optional
             Extra configuration propagated to *every* task via its
-            ``run_config`` attribute.
+            ``run_config`` attribute.  It is set just before a task runs,
+            so tasks answered from the cache are left untouched.
 
         Returns
         -------
@@ -493,57 +864,529 @@ class CachedExecutor:
             the string representations of all tasks in the pipeline.
         """
 
-        self.results = {}
-        for i, pipeline in enumerate(self.pipelines):
-            try:
-                output, runtime = self._run_pipeline(pipeline, input_, run_config)
-            except Exception:
-                if self.verbose:
-                    print(f"Error running pipeline {i + 1}/{len(self.pipelines)}.")
-                    traceback.print_exc()
-                self.results[pipeline.id] = {
-                    "output": None,
-                    "runtime": None,
-                    "tasks": [str(task) for task in pipeline.tasks],
-                }
-                continue
-            self.results[pipeline.id] = {
-                "output": output,
-                "runtime": runtime,
-                "tasks": [str(task) for task in pipeline.tasks],
-            }
-            if self.verbose:
-                print(
-                    f"Pipeline {i + 1}/{len(self.pipelines)} completed. "
-                    f"Runtime: {runtime:.2f}s."
+        steps = self._start(input_, run_config)
+        try:
+            if self.max_workers > 1 and len(self.pipelines) > 1:
+                self._run_layers(steps, run_config)
+            else:
+                self._run_depth_first(steps, run_config)
+        finally:
+            self._flush_log()
+        return self._finish()
+
+    async def run_async(
+        self, input_: Optional[Any] = None, run_config: Optional[Dict[str, Any]] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """Asynchronous counterpart of :py:meth:`run`.
+
+        Every branch of the prefix trie runs as its own coroutine on the
+        current event loop.  Tasks whose ``run`` is a coroutine function
+        are awaited directly; synchronous tasks are offloaded to a pool of
+        ``max_workers`` threads so that they do not block other branches.
+        At most ``max_workers`` tasks run at once, so raise it for tasks
+        that mostly wait on I/O.  Siblings interleave, so each of them is
+        handed its own deep copy of their shared input.  Caching and the
+        returned results are identical to :py:meth:`run`.
+
+        Parameters
+        ----------
+        input_ : Any, optional
+            Input object forwarded to the first task of each pipeline.
+        run_config : dict or None, optional
+            Extra configuration propagated to *every* task via its
+            ``run_config`` attribute.  It is set just before a task runs,
+            so tasks answered from the cache are left untouched.
+
+        Returns
+        -------
+        dict[str, dict[str, Any]]
+            Mapping **pipeline ID → {output, runtime, tasks}**, see
+            :py:meth:`run`.
+        """
+
+        steps = self._start(input_, run_config)
+        pool = ThreadPoolExecutor(max_workers=self.max_workers)
+        run_task = partial(
+            self._run_task_async, asyncio.Semaphore(self.max_workers), pool
+        )
+        try:
+            await asyncio.gather(
+                *(
+                    self._run_branch_async(step, run_task, run_config)
+                    for step in _private_inputs(steps)
                 )
+            )
+        finally:
+            pool.shutdown(wait=False)
+            self._flush_log()
+        return self._finish()
+
+    def _start(
+        self, input_: Optional[Any], run_config: Optional[Dict[str, Any]] = None
+    ) -> List[_Step]:
+        if self._trie is not None and self._trie_ids != tuple(
+            pipeline.id for pipeline in self.pipelines
+        ):
+            raise ValueError(
+                "Pipelines changed since prepare() was called; call it again."
+            )
+        self.results = {}
+        root = self._trie if self._trie is not None else self._build_trie()
+        try:
+            signature: Tuple[str, ...] = (
+                stable_hash(
+                    {"input_": input_, "run_config": run_config}, verbose=self.verbose
+                ),
+            )
+        except Exception:
+            self._record_failure(root)
+            return []
+        for _, pipeline, task_names in root.pipelines:
+            self._record_success(pipeline, task_names, input_, 0.0)
+        digest = (
+            hashlib.blake2b(signature[0].encode(), digest_size=16).digest()
+            if self.cache_dir is not None
+            else None
+        )
+        return [
+            (child, signature, _constant(input_), 0.0, digest)
+            for child in root.children.values()
+        ]
+
+    def _finish(self) -> Dict[str, Dict[str, Any]]:
+        self.results = {
+            pipeline.id: self.results[pipeline.id] for pipeline in self.pipelines
+        }
         return self.results
 
-    def _run_pipeline(
+    def _build_trie(self) -> _TrieNode:
+        root = _TrieNode(Root())
+        for i, pipeline in enumerate(self.pipelines):
+            node = root
+            task_names: List[str] = []
+            for task in pipeline.tasks:
+                child = node.children.get(task.id)
+                if child is None:
+                    child = _TrieNode(task)
+                    node.children[task.id] = child
+                node = child
+                task_names.append(node.label)
+            node.pipelines.append((i, pipeline, tuple(task_names)))
+        return root
+
+    def _run_depth_first(
+        self, steps: List[_Step], run_config: Optional[Dict[str, Any]] = None
+    ) -> None:
+        run_step = self._run_step
+        stack = steps[::-1]
+        push, pop = stack.extend, stack.pop
+        while stack:
+            push(reversed(run_step(pop(), run_config)))
+
+    def _run_layers(
+        self, steps: List[_Step], run_config: Optional[Dict[str, Any]] = None
+    ) -> None:
+        # The trie is a tree, so a topological layering is simply its
+        # breadth-first levels: every node of a layer only depends on its
+        # parent in the previous one and all of them can run at once.
+        # Cache lookups and bookkeeping stay in this thread; only the task
+        # bodies are handed to the pool, which lets the same loop drive a
+        # process pool whose workers cannot share the cache.
+        pool_class = ProcessPoolExecutor if self.use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=self.max_workers) as pool:
+            # Process workers receive pickled copies of their inputs anyway.
+            if not self.use_processes:
+                steps = _private_inputs(steps)
+            while steps:
+                pending = []
+                for step in steps:
+                    node, signature, get_input, runtime, digest = self._enter_step(step)
+                    try:
+                        hit = self._lookup(
+                            signature,
+                            digest,
+                            partial(self._rerun, node.task, get_input, run_config),
+                        )
+                        content_key = future = None
+                        if hit is None:
+                            input_ = get_input()
+                            hit, content_key = self._lookup_equal_input(
+                                node.task, signature, digest, input_, run_config
+                            )
+                        if hit is None:
+                            node.task.run_config = run_config
+                            future = pool.submit(_timed_run, node.task, input_)
+                    except Exception:
+                        self._record_failure(node)
+                        continue
+                    pending.append(
+                        (node, signature, runtime, digest, hit, content_key, future)
+                    )
+                steps = []
+                for (
+                    node,
+                    signature,
+                    runtime,
+                    digest,
+                    hit,
+                    content_key,
+                    future,
+                ) in pending:
+                    try:
+                        if future is not None:
+                            hit = self._remember(
+                                signature, digest, *future.result(), content_key
+                            )
+                        assert hit is not None
+                        task_runtime, get_output = hit
+                        output = get_output() if node.pipelines else None
+                    except Exception:
+                        self._record_failure(node)
+                        continue
+                    children = self._leave_step(
+                        node,
+                        signature,
+                        get_output,
+                        output,
+                        runtime + task_runtime,
+                        digest,
+                    )
+                    if not self.use_processes:
+                        children = _private_inputs(children)
+                    steps.extend(children)
+
+    async def _run_branch_async(
         self,
-        pipeline: Pipeline,
-        input_: Optional[Any] = None,
+        step: _Step,
+        run_task: _AsyncRunner,
         run_config: Optional[Dict[str, Any]] = None,
-    ) -> Tuple[Any, float]:
-        runtime = 0.0
-        task_signature: Tuple[str, ...] = (
-            stable_hash(
-                {"input_": input_, "run_config": run_config}, verbose=self.verbose
-            ),
+    ) -> None:
+        steps = await self._run_step_async(step, run_task, run_config)
+        await asyncio.gather(
+            *(
+                self._run_branch_async(child, run_task, run_config)
+                for child in _private_inputs(steps)
+            )
         )
-        for task in pipeline:
-            task.run_config = run_config
-            task_signature = (*task_signature, task.id)
-            if task_signature in self.cache:
-                input_ = self.cache[task_signature]["output"]
-                runtime += self.cache[task_signature]["runtime"]
-            else:
+
+    async def _run_task_async(
+        self,
+        semaphore: asyncio.Semaphore,
+        pool: ThreadPoolExecutor,
+        task: Task,
+        input_: Any,
+    ) -> Tuple[Any, float]:
+        async with semaphore:
+            if inspect.iscoroutinefunction(task.run):
                 start_time = time.perf_counter()
-                input_ = task.run(input_)
-                end_time = time.perf_counter()
-                self.cache[task_signature] = {
-                    "output": input_,
-                    "runtime": end_time - start_time,
+                output = await task.run(input_)
+                return output, time.perf_counter() - start_time
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, _timed_run, task, input_)
+
+    def _run_step(
+        self, step: _Step, run_config: Optional[Dict[str, Any]] = None
+    ) -> List[_Step]:
+        node, signature, get_input, runtime, digest = self._enter_step(step)
+        try:
+            task_runtime, get_output = self._cached_run(
+                node.task, signature, get_input, digest, run_config
+            )
+            output = get_output() if node.pipelines else None
+        except Exception:
+            self._record_failure(node)
+            return []
+        return self._leave_step(
+            node, signature, get_output, output, runtime + task_runtime, digest
+        )
+
+    async def _run_step_async(
+        self,
+        step: _Step,
+        run_task: _AsyncRunner,
+        run_config: Optional[Dict[str, Any]] = None,
+    ) -> List[_Step]:
+        node, signature, get_input, runtime, digest = self._enter_step(step)
+        try:
+            task_runtime, get_output = await self._cached_run_async(
+                node.task, signature, get_input, run_task, digest, run_config
+            )
+            output = get_output() if node.pipelines else None
+        except Exception:
+            self._record_failure(node)
+            return []
+        return self._leave_step(
+            node, signature, get_output, output, runtime + task_runtime, digest
+        )
+
+    def _enter_step(self, step: _Step) -> _Step:
+        node, signature, get_input, runtime, digest = step
+        task = node.task
+        signature = (*signature, task.id)
+        if digest is not None:
+            digest = self._content_digest(digest, task)
+        return node, signature, get_input, runtime, digest
+
+    def _leave_step(
+        self,
+        node: _TrieNode,
+        signature: Tuple[str, ...],
+        get_output: Callable[[], Any],
+        output: Any,
+        runtime: float,
+        digest: Optional[bytes],
+    ) -> List[_Step]:
+        for _, pipeline, task_names in node.pipelines:
+            self._record_success(pipeline, task_names, output, runtime)
+        return [
+            (child, signature, get_output, runtime, digest)
+            for child in node.children.values()
+        ]
+
+    def _content_digest(self, parent: bytes, task: Task) -> Optional[bytes]:
+        try:
+            identity = _task_identity(task)
+        except Exception:
+            return None
+        h = hashlib.blake2b(parent, digest_size=16)
+        h.update(identity.encode())
+        return h.digest()
+
+    def _cached_run(
+        self,
+        task: Task,
+        task_signature: Tuple[str, ...],
+        get_input: Callable[[], Any],
+        digest: Optional[bytes] = None,
+        run_config: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[float, Callable[[], Any]]:
+        hit = self._lookup(
+            task_signature,
+            digest,
+            partial(self._rerun, task, get_input, run_config),
+        )
+        if hit is not None:
+            return hit
+        input_ = get_input()
+        hit, content_key = self._lookup_equal_input(
+            task, task_signature, digest, input_, run_config
+        )
+        if hit is not None:
+            return hit
+        task.run_config = run_config
+        output, runtime = _timed_run(task, input_)
+        return self._remember(task_signature, digest, output, runtime, content_key)
+
+    async def _cached_run_async(
+        self,
+        task: Task,
+        task_signature: Tuple[str, ...],
+        get_input: Callable[[], Any],
+        run_task: _AsyncRunner,
+        digest: Optional[bytes] = None,
+        run_config: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[float, Callable[[], Any]]:
+        hit = self._lookup(
+            task_signature,
+            digest,
+            partial(self._rerun, task, get_input, run_config),
+        )
+        if hit is not None:
+            return hit
+        input_ = get_input()
+        hit, content_key = self._lookup_equal_input(
+            task, task_signature, digest, input_, run_config
+        )
+        if hit is not None:
+            return hit
+        task.run_config = run_config
+        output, runtime = await run_task(task, input_)
+        return self._remember(task_signature, digest, output, runtime, content_key)
+
+    def _lookup(
+        self,
+        task_signature: Tuple[str, ...],
+        digest: Optional[bytes],
+        rerun: Callable[[], Tuple[Any, float]],
+    ) -> Optional[Tuple[float, Callable[[], Any]]]:
+        entry: Optional[Dict[str, Any]] = self.cache.get(task_signature)
+        if entry is not None:
+            return entry["runtime"], _constant(entry["output"])
+        path = self._cache_path(digest)
+        if path is not None:
+            runtime = self._load_runtime(path)
+            if runtime is not None:
+                return runtime, self._deferred_output(
+                    task_signature, digest, path, runtime, rerun
+                )
+        return None
+
+    def _lookup_equal_input(
+        self,
+        task: Task,
+        task_signature: Tuple[str, ...],
+        digest: Optional[bytes],
+        input_: Any,
+        run_config: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Optional[Tuple[float, Callable[[], Any]]], Optional[_ContentKey]]:
+        if not self.share_equal_inputs:
+            return None, None
+        try:
+            content_key = (
+                _task_identity(task),
+                stable_hash(run_config),
+                stable_hash(input_),
+            )
+        except Exception:
+            return None, None
+        entry = self.content_cache.get(content_key)
+        if entry is None:
+            return None, content_key
+        hit = self._remember(task_signature, digest, entry["output"], entry["runtime"])
+        return hit, content_key
+
+    def _remember(
+        self,
+        task_signature: Tuple[str, ...],
+        digest: Optional[bytes],
+        output: Any,
+        runtime: float,
+        content_key: Optional[_ContentKey] = None,
+    ) -> Tuple[float, Callable[[], Any]]:
+        entry = {"output": output, "runtime": runtime}
+        path = self._cache_path(digest)
+        if path is not None:
+            self._store_entry(path, entry)
+        self.cache[task_signature] = entry
+        if content_key is not None:
+            self.content_cache[content_key] = entry
+        return runtime, _constant(output)
+
+    def _cache_path(self, digest: Optional[bytes]) -> Optional[Path]:
+        if self.cache_dir is None or digest is None:
+            return None
+        return self.cache_dir / f"{digest.hex()}.pkl"
+
+    # Entries are stored as two consecutive pickles, the runtime first, so
+    # a hit can be recorded without unpickling the output.  The output is
+    # only loaded when a pipeline ends at the task or a downstream task
+    # actually has to run.
+
+    def _load_runtime(self, path: Path) -> Optional[float]:
+        try:
+            with path.open("rb") as f:
+                runtime: float = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:
+            if self.verbose:
+                warnings.warn(f"Ignoring unreadable cache entry {path}.", UserWarning)
+            return None
+        return runtime
+
+    def _deferred_output(
+        self,
+        task_signature: Tuple[str, ...],
+        digest: Optional[bytes],
+        path: Path,
+        runtime: float,
+        rerun: Callable[[], Tuple[Any, float]],
+    ) -> Callable[[], Any]:
+        loaded: List[Any] = []
+
+        def load() -> Any:
+            if not loaded:
+                try:
+                    with path.open("rb") as f:
+                        pickle.load(f)
+                        output = pickle.load(f)
+                except Exception:
+                    # Treat the entry like any other unreadable one: drop
+                    # it and run the task again, which also re-persists it.
+                    if self.verbose:
+                        warnings.warn(
+                            f"Ignoring unreadable cache entry {path}.", UserWarning
+                        )
+                    path.unlink(missing_ok=True)
+                    output = self._remember(task_signature, digest, *rerun())[1]()
+                else:
+                    self.cache[task_signature] = {"output": output, "runtime": runtime}
+                loaded.append(output)
+            return loaded[0]
+
+        return load
+
+    def _rerun(
+        self,
+        task: Task,
+        get_input: Callable[[], Any],
+        run_config: Optional[Dict[str, Any]] = None,
+    ) -> Tuple[Any, float]:
+        if inspect.iscoroutinefunction(task.run):
+            raise RuntimeError(
+                f"Cannot re-run coroutine task {task} outside of run_async."
+            )
+        task.run_config = run_config
+        return _timed_run(task, get_input())
+
+    def _store_entry(self, path: Path, entry: Dict[str, Any]) -> None:
+        tmp_path = path.with_name(f"{path.name}.{_new_id()}.tmp")
+        try:
+            with tmp_path.open("wb") as f:
+                pickle.dump(entry["runtime"], f, protocol=5)
+                pickle.dump(entry["output"], f, protocol=5)
+            os.replace(tmp_path, path)
+        except Exception:
+            tmp_path.unlink(missing_ok=True)
+            if self.verbose:
+                warnings.warn(f"Could not persist cache entry {path}.", UserWarning)
+
+    def _record_success(
+        self,
+        pipeline: Pipeline,
+        task_names: Tuple[str, ...],
+        output: Any,
+        runtime: float,
+    ) -> None:
+        self.results[pipeline.id] = {
+            "output": output,
+            "runtime": runtime,
+            "tasks": list(task_names),
+        }
+        if self.verbose:
+            done, total = len(self.results), len(self.pipelines)
+            if done == total or not done % -(-total // _LOG_PROGRESS_STEPS):
+                self._log(
+                    f"Pipeline {done}/{total} completed. Runtime: {runtime:.2f}s."
+                )
+
+    def _record_failure(self, node: _TrieNode) -> None:
+        if self.verbose:
+            self._flush_log()
+            traceback.print_exc()
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            for _, pipeline, task_names in node.pipelines:
+                self.results[pipeline.id] = {
+                    "output": None,
+                    "runtime": None,
+                    "tasks": list(task_names),
                 }
-                runtime += end_time - start_time
-        return input_, runtime
+                if self.verbose:
+                    self._log(
+                        f"Error running pipeline {len(self.results)}"
+                        f"/{len(self.pipelines)}."
+                    )
+            stack.extend(node.children.values())
+
+    def _log(self, message: str) -> None:
+        self._log_lines.append(message + "\n")
+        if len(self._log_lines) >= _LOG_FLUSH_EVERY:
+            self._flush_log()
+
+    def _flush_log(self) -> None:
+        if self._log_lines:
+            sys.stdout.write("".join(self._log_lines))
+            sys.stdout.flush()
+            self._log_lines = []
@@ -13,6 +13,7 @@ import hashlib
 import json
 import pickle
 import warnings
+from functools import lru_cache
 from typing import Any, Iterable, Tuple
 
 
@@ -39,6 +40,37 @@ def _hash_bytes(obj: Any) -> bytes:
     return hashlib.sha256(blob).digest()
 
 
+@lru_cache(maxsize=4096, typed=True)
+def _hash_scalar(obj: Any) -> bytes:
+    """Memoised :func:`_hash_bytes` for hashable JSON scalars."""
+    return _hash_bytes(obj)
+
+
+def _sort_key(obj: Any) -> bytes:
+    """
+    Ordering key for canonical dict items and set members.
+
+    Dict keys are almost always short strings that recur across calls
+    (e.g. ``"input_"`` and ``"run_config"`` for every executor run), so
+    their digests are memoised instead of re-serialised each time.
+    Floats are not memoised: ``0.0 == -0.0`` share a cache slot but
+    serialise differently.
+
+    Parameters
+    ----------
+    obj : Any
+        A value already in canonical form.
+
+    Returns
+    -------
+    bytes
+        The SHA-256 digest of *obj* serialised with strict JSON.
+    """
+    if obj is None or isinstance(obj, (str, int)):
+        return _hash_scalar(obj)
+    return _hash_bytes(obj)
+
+
 def _canon(obj: Any) -> Any:
     """
     Convert *obj* to a fully ordered, JSON-serialisable structure.
@@ -62,10 +94,10 @@ def _canon(obj: Any) -> Any:
         items: Iterable[Tuple[Any, Any]] = (
             (_canon(k), _canon(v)) for k, v in obj.items()
         )
-        return [list(pair) for pair in sorted(items, key=lambda kv: _hash_bytes(kv[0]))]
+        return [list(pair) for pair in sorted(items, key=lambda kv: _sort_key(kv[0]))]
 
     if isinstance(obj, (set, frozenset)):
-        return sorted((_canon(x) for x in obj), key=_hash_bytes)
+        return sorted((_canon(x) for x in obj), key=_sort_key)
 
     if isinstance(obj, (list, tuple)):
         return [_canon(x) for x in obj]
@@ -1,3 +1,10 @@
+import asyncio
+import copy
+import enum
+import multiprocessing
+import pickle
+import time
+
 import pytest
 
 import src.pypekit.core as pm
@@ -29,6 +36,22 @@ class DummyTransform(Task):
         return input_ + "_transformed"
 
 
+class CountingTransform(Task):
+    input_types = ["a"]
+    output_types = ["b"]
+    calls = []
+
+    def run(self, input_):
+        self.calls.append(input_)
+        return input_ + "_transformed"
+
+
+@pytest.fixture
+def calls():
+    CountingTransform.calls.clear()
+    return CountingTransform.calls
+
+
 class DummySink(Task):
     input_types = ["b"]
     output_types = [SINK_TYPE]
@@ -161,3 +184,466 @@ def test_cached_executor_error(capsys):
     assert res[pid]["runtime"] is None
     captured = capsys.readouterr().out
     assert "Error running pipeline" in captured
+
+
+def test_cached_executor_parallel_shares_prefix():
+    calls = []
+
+    class CountingSource(Task):
+        input_types = [SOURCE_TYPE]
+        output_types = ["a"]
+
+        def run(self, input_=None):
+            calls.append(self.id)
+            return "data"
+
+    source = CountingSource()
+    pipelines = [Pipeline([source, DummyTransform(), DummySink()]) for _ in range(4)]
+    executor = CachedExecutor(pipelines, max_workers=4)
+    res = executor.run(None)
+    assert len(calls) == 1
+    assert [res[p.id]["output"] for p in pipelines] == ["data_transformed_sink"] * 4
+    assert res[pipelines[0].id]["tasks"] == [
+        "CountingSource()",
+        "DummyTransform()",
+        "DummySink()",
+    ]
+
+
+def test_cached_executor_failure_marks_dependent_pipelines():
+    faulty = FaultyTask()
+    pipelines = [
+        Pipeline([DummySource(), faulty, DummySink()]),
+        Pipeline([DummySource(), DummyTransform(), DummySink()]),
+    ]
+    pipelines.insert(1, Pipeline([pipelines[0].tasks[0], faulty, DummySink()]))
+    res = CachedExecutor(pipelines).run(None)
+    assert [res[p.id]["output"] for p in pipelines] == [
+        None,
+        None,
+        "data_transformed_sink",
+    ]
+    assert list(res) == [p.id for p in pipelines]
+
+
+class Passthrough(Task):
+    input_types = ["a"]
+    output_types = ["a"]
+
+    def run(self, input_):
+        return input_
+
+
+def test_repository_deduplicates_identical_entries():
+    repo = Repository(
+        tasks=[DummySource, Passthrough, Passthrough, DummyTransform, DummySink]
+    )
+    repo.build_tree()
+    chains = [[t.__class__.__name__ for t in p] for p in repo.build_pipelines()]
+    assert len(chains) == 3
+    assert len({tuple(chain) for chain in chains}) == 3
+
+
+def test_repository_iter_pipelines_feeds_executor():
+    repo = Repository(tasks=[DummySource, DummyTransform, DummySink])
+    with pytest.raises(ValueError):
+        repo.iter_pipelines()
+    repo.build_tree()
+    pipelines = repo.iter_pipelines()
+    assert not repo.pipelines
+    executor = CachedExecutor(pipelines)
+    res = executor.run(None)
+    assert [r["output"] for r in res.values()] == ["data_transformed_sink"]
+
+
+def test_cached_executor_persistent_cache(tmp_path, calls):
+    def make_pipelines():
+        return [Pipeline([DummySource(), CountingTransform(), DummySink()])]
+
+    first = CachedExecutor(make_pipelines(), cache_dir=tmp_path).run(None)
+    pipelines = make_pipelines()
+    executor = CachedExecutor(pipelines, cache_dir=tmp_path)
+    second = executor.run(None)
+    assert len(calls) == 1
+    # Only the final output is unpickled; intermediate hits stay on disk.
+    assert len(executor.cache) == 1
+    assert second[pipelines[0].id]["output"] == "data_transformed_sink"
+    assert list(first.values())[0]["runtime"] == second[pipelines[0].id]["runtime"]
+    CachedExecutor(make_pipelines(), cache_dir=tmp_path).run("other")
+    assert len(calls) == 2
+
+
+def test_cached_executor_run_async():
+    class AsyncTransform(Task):
+        input_types = ["a"]
+        output_types = ["b"]
+
+        async def run(self, input_):
+            await asyncio.sleep(0)
+            return input_ + "_async"
+
+    source = DummySource()
+    pipelines = [
+        Pipeline([source, AsyncTransform(), DummySink()]),
+        Pipeline([source, DummyTransform(), DummySink()]),
+    ]
+    executor = CachedExecutor(pipelines)
+    res = asyncio.run(executor.run_async(None))
+    assert [res[p.id]["output"] for p in pipelines] == [
+        "data_async_sink",
+        "data_transformed_sink",
+    ]
+    assert len(executor.cache) == 5
+
+
+def test_cached_executor_process_pool():
+    pipelines = [
+        Pipeline([DummySource(), DummyTransform(), DummySink()]),
+        Pipeline([DummySource(), FaultyTask(), DummySink()]),
+    ]
+    executor = CachedExecutor(pipelines, max_workers=2, use_processes=True)
+    res = executor.run(None)
+    assert [res[p.id]["output"] for p in pipelines] == ["data_transformed_sink", None]
+    assert len(executor.cache) == 4
+
+
+def test_repository_skips_tasks_that_cannot_reach_sink():
+    created = []
+
+    class DeadEnd(Task):
+        input_types = ["a"]
+        output_types = ["z"]
+
+        def __init__(self):
+            created.append(self)
+
+        def run(self, input_):
+            return input_
+
+    repo = Repository(tasks=[DummySource, DeadEnd, DummyTransform, DummySink])
+    repo.build_tree()
+    # Probed once for its output types, but never attached to the tree.
+    assert len(created) == 1
+    assert "DeadEnd" not in repo.build_tree_string()
+    assert len(repo.build_pipelines()) == 1
+
+
+def test_repository_reads_output_types_from_instances():
+    class Loader(Task):
+        input_types = [SOURCE_TYPE]
+
+        def __init__(self, fmt):
+            self.output_types = [fmt]
+
+        def run(self, input_=None):
+            return "data"
+
+    class CsvSink(Task):
+        input_types = ["csv"]
+        output_types = [SINK_TYPE]
+
+        def run(self, input_):
+            return input_ + "_csv"
+
+    repo = Repository(tasks=[(Loader, {"fmt": "csv"}), (Loader, {"fmt": "x"}), CsvSink])
+    repo.build_tree()
+    pipelines = repo.build_pipelines()
+    assert [[type(t).__name__ for t in p] for p in pipelines] == [["Loader", "CsvSink"]]
+    assert pipelines[0].tasks[0].kwargs == {"fmt": "csv"}
+
+
+def test_cached_executor_throttles_progress(capsys):
+    sources = [DummySource(), DummySource()]
+    pipelines = [
+        Pipeline([sources[i % 2], DummyTransform(), DummySink()]) for i in range(199)
+    ]
+    CachedExecutor(pipelines, verbose=True).run(None)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split()[1] for line in lines] == [
+        f"{done}/199" for done in [*range(2, 199, 2), 199]
+    ]
+
+    pipelines = [
+        Pipeline([DummySource(), DummyTransform(), DummySink()]),
+        Pipeline([DummySource(), FaultyTask(), DummySink()]),
+        Pipeline([DummySource(), DummyTransform(), DummySink()]),
+    ]
+    CachedExecutor(pipelines, verbose=True).run(None)
+    lines = capsys.readouterr().out.splitlines()
+    assert [line.split(".")[0] for line in lines] == [
+        "Pipeline 1/3 completed",
+        "Error running pipeline 2/3",
+        "Pipeline 3/3 completed",
+    ]
+
+
+def test_cached_executor_shares_equal_inputs(calls):
+    for max_workers in (1, 2):
+        calls.clear()
+        source = DummySource()
+        pipelines = [
+            Pipeline([source, Passthrough(), CountingTransform(), DummySink()]),
+            Pipeline([source, CountingTransform(), DummySink()]),
+        ]
+        executor = CachedExecutor(
+            pipelines, max_workers=max_workers, share_equal_inputs=True
+        )
+        res = executor.run(None)
+        assert calls == ["data"]
+        assert [res[p.id]["output"] for p in pipelines] == ["data_transformed_sink"] * 2
+
+
+def test_cached_executor_prepare_reuses_trie(monkeypatch):
+    pipelines = [Pipeline([DummySource(), DummyTransform(), DummySink()])]
+    executor = CachedExecutor(pipelines).prepare()
+    monkeypatch.setattr(executor, "_build_trie", lambda: pytest.fail("rebuilt"))
+    first = executor.run(None)
+    second = executor.run("other")
+    assert first[pipelines[0].id]["output"] == "data_transformed_sink"
+    assert second[pipelines[0].id]["tasks"] == first[pipelines[0].id]["tasks"]
+    assert second[pipelines[0].id]["tasks"] is not first[pipelines[0].id]["tasks"]
+
+
+class Scale(Task):
+    input_types = ["a"]
+    output_types = ["b"]
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def run(self, input_):
+        return input_ * self.factor
+
+
+class Suffix(Task):
+    input_types = ["a"]
+    output_types = [SINK_TYPE]
+
+    def __init__(self, suffix):
+        self.suffix = suffix
+
+    def run(self, input_):
+        return input_ + self.suffix
+
+
+def test_cached_executor_persistent_cache_tells_instances_apart(tmp_path):
+    source = DummySource()
+    for _ in range(2):
+        pipelines = [Pipeline([source, Scale(2)]), Pipeline([source, Scale(3)])]
+        res = CachedExecutor(pipelines, cache_dir=tmp_path).run(None)
+        assert [res[p.id]["output"] for p in pipelines] == ["data" * 2, "data" * 3]
+
+    repo = Repository(
+        tasks=[DummySource, Pipeline([Suffix("A")]), Pipeline([Suffix("B")])]
+    )
+    repo.build_tree()
+    pipelines = repo.build_pipelines()
+    res = CachedExecutor(pipelines, cache_dir=tmp_path).run(None)
+    assert [res[p.id]["output"] for p in pipelines] == ["dataA", "dataB"]
+
+
+def test_cached_executor_does_not_persist_unidentifiable_tasks(tmp_path):
+    task = Scale(2)
+    task.hook = lambda: None
+    pipelines = [Pipeline([DummySource(), task, DummySink()])]
+    res = CachedExecutor(pipelines, cache_dir=tmp_path).run(None)
+    assert res[pipelines[0].id]["output"] == "datadata_sink"
+    assert len(list(tmp_path.glob("*.pkl"))) == 1
+
+
+def test_cached_executor_shared_inputs_respect_instance_and_run_config():
+    source = DummySource()
+    pipelines = [Pipeline([source, Scale(2)]), Pipeline([source, Scale(3)])]
+    res = CachedExecutor(pipelines, share_equal_inputs=True).run(None)
+    assert [res[p.id]["output"] for p in pipelines] == ["data" * 2, "data" * 3]
+
+    pipeline = Pipeline([ConfigTask()])
+    executor = CachedExecutor([pipeline], share_equal_inputs=True)
+    assert executor.run(None, run_config={"x": 1})[pipeline.id]["output"] == 1
+    assert executor.run(None, run_config={"x": 2})[pipeline.id]["output"] == 2
+
+
+def test_cached_executor_reruns_tasks_with_unreadable_outputs(tmp_path, calls):
+    def run():
+        pipelines = [Pipeline([DummySource(), CountingTransform(), DummySink()])]
+        res = CachedExecutor(pipelines, cache_dir=tmp_path).run(None)
+        return res[pipelines[0].id]
+
+    run()
+    for path in tmp_path.glob("*.pkl"):
+        path.write_bytes(pickle.dumps(1.0) + b"garbage")
+    assert run()["output"] == "data_transformed_sink"
+    assert len(calls) == 2
+    assert run()["output"] == "data_transformed_sink"
+    assert len(calls) == 2
+
+
+def test_pipeline_run_sets_run_config_on_every_task():
+    tasks = [ConfigTask(), ConfigTask(), ConfigTask()]
+    p = Pipeline(tasks)
+    p.run_config = {"x": 1}
+    assert p.run(None) == 1
+    assert [t.run_config for t in tasks] == [{"x": 1}] * 3
+
+
+def test_cached_executor_sets_run_config_only_on_cache_misses():
+    source, transform, sink = DummySource(), DummyTransform(), DummySink()
+    full = Pipeline([source, transform, sink])
+    prefix = Pipeline([source, transform])
+    first = CachedExecutor([prefix])
+    first.run(None, run_config={"x": 1})
+    assert source.run_config == transform.run_config == {"x": 1}
+    source.run_config = transform.run_config = {"x": 0}
+    CachedExecutor([prefix, full], cache=first.cache).run(None, run_config={"x": 1})
+    assert source.run_config == transform.run_config == {"x": 0}
+    assert sink.run_config == {"x": 1}
+
+
+def test_repository_prunes_dead_branches_in_baseline_order():
+    class SourceSink(Task):
+        input_types = [SOURCE_TYPE]
+        output_types = ["a", SINK_TYPE]
+
+        def run(self, input_=None):
+            return input_
+
+    class Loop(Task):
+        input_types = ["a"]
+        output_types = ["a"]
+
+        def run(self, input_):
+            return input_
+
+    class DirectSink(Task):
+        input_types = [SOURCE_TYPE]
+        output_types = [SINK_TYPE]
+
+        def run(self, input_=None):
+            return input_
+
+    for max_depth in (1, 5):
+        repo = Repository(tasks=[SourceSink, Loop, DirectSink])
+        repo.build_tree(max_depth=max_depth)
+        assert repo.build_tree_string() == (
+            "└── Root()\n    ├── SourceSink()\n    └── DirectSink()\n"
+        )
+        # SourceSink lost its (dead) subtree, so it follows the leaves that
+        # never had children.
+        assert [type(leaf.task).__name__ for leaf in repo.leaves] == [
+            "DirectSink",
+            "SourceSink",
+        ]
+
+
+def test_cached_executor_can_be_pickled_and_copied():
+    pipelines = [Pipeline([DummySource(), DummyTransform(), DummySink()])]
+    executor = CachedExecutor(pipelines)
+    executor.run(None)
+    for clone in (pickle.loads(pickle.dumps(executor)), copy.deepcopy(executor)):
+        res = clone.run(None)
+        assert list(res.values())[0]["output"] == "data_transformed_sink"
+
+
+def test_repository_accepts_non_str_type_identifiers():
+    class Kind(str, enum.Enum):
+        A = "a"
+
+    class EnumTransform(Task):
+        input_types = [Kind.A]
+        output_types = ["b"]
+
+        def run(self, input_):
+            return input_
+
+    repo = Repository(tasks=[DummySource, EnumTransform, DummySink])
+    repo.build_tree()
+    assert len(repo.build_pipelines()) == 1
+
+
+def _pipeline_id(_):
+    return Pipeline().id
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(), reason="needs fork"
+)
+def test_ids_differ_across_forked_processes():
+    with multiprocessing.get_context("fork").Pool(4) as pool:
+        ids = pool.map(_pipeline_id, range(4), chunksize=1)
+    assert len(set(ids) | {Pipeline().id}) == 5
+
+
+def test_cached_executor_rejects_stale_prepared_plan():
+    pipelines = [Pipeline([DummySource(), DummyTransform(), DummySink()])]
+    executor = CachedExecutor(pipelines).prepare()
+    executor.pipelines.append(Pipeline([DummySource(), DummyTransform()]))
+    with pytest.raises(ValueError, match="prepare"):
+        executor.run(None)
+    res = executor.prepare().run(None)
+    assert [r["output"] for r in res.values()] == [
+        "data_transformed_sink",
+        "data_transformed",
+    ]
+
+
+class Labeler(Task):
+    input_types = ["a"]
+    output_types = ["b"]
+
+    def __init__(self, label):
+        self.label = label
+
+    def run(self, input_):
+        input_["predicted"] = self.label
+        return input_
+
+
+class LabelReader(Task):
+    input_types = ["b"]
+    output_types = [SINK_TYPE]
+
+    def run(self, input_):
+        return input_["predicted"]
+
+
+def _labeling_pipelines():
+    source = Passthrough()
+    return [
+        Pipeline([source, Labeler(label), LabelReader()]) for label in ("A", "B", "C")
+    ]
+
+
+def test_cached_executor_layers_give_siblings_their_own_input():
+    pipelines = _labeling_pipelines()
+    res = CachedExecutor(pipelines, max_workers=4).run({})
+    assert [res[p.id]["output"] for p in pipelines] == ["A", "B", "C"]
+
+
+def test_cached_executor_run_async_gives_siblings_their_own_input():
+    pipelines = _labeling_pipelines()
+    res = asyncio.run(CachedExecutor(pipelines, max_workers=4).run_async({}))
+    assert [res[p.id]["output"] for p in pipelines] == ["A", "B", "C"]
+
+
+def test_cached_executor_run_async_respects_max_workers():
+    active = []
+    peak = []
+
+    class SlowTransform(Task):
+        input_types = ["a"]
+        output_types = [SINK_TYPE]
+
+        def run(self, input_):
+            active.append(self)
+            peak.append(len(active))
+            time.sleep(0.05)
+            active.remove(self)
+            return input_
+
+    source = DummySource()
+    pipelines = [Pipeline([source, SlowTransform()]) for _ in range(4)]
+    asyncio.run(CachedExecutor(pipelines).run_async(None))
+    assert max(peak) == 1
+    peak.clear()
+    asyncio.run(CachedExecutor(pipelines, max_workers=4).run_async(None))
+    assert max(peak) > 1
@@ -0,0 +1,49 @@
+import hashlib
+import json
+
+import src.pypekit.hashing as hashing
+from src.pypekit.hashing import stable_hash
+
+
+def _reference_hash(obj):
+    # stable_hash as it was before sort keys were memoised.
+    def canon(obj):
+        if isinstance(obj, dict):
+            items = ((canon(k), canon(v)) for k, v in obj.items())
+            return [
+                list(pair)
+                for pair in sorted(items, key=lambda kv: hashing._hash_bytes(kv[0]))
+            ]
+        if isinstance(obj, (set, frozenset)):
+            return sorted((canon(x) for x in obj), key=hashing._hash_bytes)
+        if isinstance(obj, (list, tuple)):
+            return [canon(x) for x in obj]
+        return obj
+
+    blob = json.dumps(
+        canon(obj), separators=(",", ":"), ensure_ascii=False, allow_nan=False
+    ).encode()
+    return "json:" + hashlib.sha256(blob).hexdigest()
+
+
+def test_stable_hash_matches_unmemoised_sort_keys():
+    hashing._hash_scalar.cache_clear()
+    objects = [
+        {"input_": [1, 2], "run_config": {"x": 1, "y": None}},
+        {1: "a", True: "b", "1": "c", None: "d", 2.5: "e"},
+        {frozenset({3, 1, 2}), frozenset({"b", "a"})},
+        {0.0: "zero"},
+        {-0.0: 1, "b": 2, "c": 3},
+        {0.0, -0.0, 1.0} | {-0.0},
+    ]
+    for obj in objects + objects[::-1]:
+        assert stable_hash(obj) == _reference_hash(obj)
+
+
+def test_stable_hash_signed_zero_does_not_depend_on_history():
+    obj = {-0.0: 1, "b": 2, "c": 3, "d": 4}
+    hashing._hash_scalar.cache_clear()
+    cold = stable_hash(obj)
+    hashing._hash_scalar.cache_clear()
+    stable_hash({0.0: 1, "b": 2})
+    assert stable_hash(obj) == cold == _reference_hash(obj)